@@ -1,17 +1,20 @@
 from time import sleep
 from string import ascii_lowercase
 import argparse
+import numbers
+import sys
 
 class Tape():
-    """A wrapper around a python list to act as a Tape for a Turing Machine
+    """A pair of python bytearrays, one on each side of the head, that act as a Tape for a Turing Machine
     """
+    __slots__ = ('_left', '_right')
 
     class direction:
         """Enumeration type for the directions on the tape (left,right,stay)
         """
-        right = 'R'
-        left = 'L'
-        stay = 'S'
+        right = 1
+        left = -1
+        stay = 0
 
     class char_codes:
         """enumeration type for character codes used in printing
@@ -21,55 +24,83 @@ class Tape():
         UNDERLINE = '\033[4m'
         END = '\033[0m'
 
+    # The character (or None) stored as each possible cell value, so reading a cell back is an index instead of a call
+    _chars = (None,) + tuple(map(chr, range(1, 256)))
+
+    # A cell is always drawn as one of 256 strings (plus a highlighted version for the head), so render them once here
+    # rather than formatting every cell on every frame
+    _drawn_cells = tuple(map((char_codes.UNDERLINE + '{}' + char_codes.END).format, (' ',) + _chars[1:]))
+    _drawn_heads = tuple(map((char_codes.RED + '{}' + char_codes.END).format, _drawn_cells))
+
     def __init__(self, initial_state='hello', start_size=None):
-        """A wrapper around a python list to act as a Tape for a Turing Machine
+        """A pair of python bytearrays, one on each side of the head, that act as a Tape for a Turing Machine
+
+        Each cell is a single byte holding the code of its character, with 0 standing for an empty cell (None), so only
+        characters from '\\x01' to '\\xff' can be written to the tape.
+
+        The tape is kept as two stacks that meet at the head: _left holds the cells to the left of the head (top is the
+        cell next to the head) and _right holds the head cell and everything to its right, reversed (top is the head cell).
+        Moving the head pops a cell off one stack and pushes it onto the other, so the tape grows in either direction in
+        amortized constant time instead of copying the whole list.
 
         Keyword Arguments:
             initial_state {str} -- The initial text on the tape (default: {'hello'})
             start_size {int} -- The initial size of the tape if initial_state is None. Ignored if initial_state is not None (default: {None})
         """
-        self._loc = 0
+        self._left = bytearray()
 
         if initial_state:
-            self._list = list(initial_state)
-            # self._expand_left(3)
-            # self._expand_right(3)
+            self._right = bytearray(initial_state[::-1], 'latin-1')
+            if 0 in self._right:
+                raise ValueError("'\\x00' does not fit in a tape cell")
         else:
             if start_size:
-                self._list = [None] * start_size
+                self._right = bytearray(start_size)
             else:
-                self._list = []
+                self._right = bytearray(1)
 
-        self._min_loc = 0
-        self._max_loc = self._get_max_loc()
-
-    def _expand_left(self, n_spaces):
-        self._loc = self._loc + n_spaces
-        new_left = [None] * n_spaces
-        self._list = new_left + self._list
-        self._max_loc = self._get_max_loc()
-    
-    def _expand_right(self, n_spaces):
-        new_right = [None] * n_spaces
-        self._list = self._list + new_right
-        self._max_loc = self._get_max_loc()
-
-    def _get_max_loc(self):
-        return len(self._list) - 1
+    @staticmethod
+    def _encode(char):
+        """Convert a character (or None) to the value stored in a tape cell
+        """
+        cell = ord(char) if char is not None else 0
+        if char is not None and not 0 < cell < 256:
+            raise ValueError(f'{char!r} does not fit in a tape cell')
+        return cell
 
     def move_left(self):
         """Move the head on the tape one spot to the left
         """
-        if self._loc == self._min_loc:
-            self._expand_left(1)
-        self._loc -= 1
+        self._right.append(self._left.pop() if self._left else 0)
 
     def move_right(self):
         """Move the head on the tape one spot to the right
         """
-        if self._loc == self._max_loc:
-            self._expand_right(1)
-        self._loc += 1
+        self._left.append(self._right.pop())
+        if not self._right:
+            self._right.append(0)
+
+    def move(self, direction):
+        """Move the head on the tape one spot in the given direction
+
+        Arguments:
+            direction {int} -- One of Tape.direction.right, Tape.direction.left or Tape.direction.stay
+        """
+        if direction > 0:
+            self.move_right()
+        elif direction < 0:
+            self.move_left()
+
+    def rewind(self, trim=False):
+        """Move the head back to the leftmost cell of the tape
+
+        Keyword Arguments:
+            trim {bool} -- If True, first drop the empty cells from both ends of the tape (default: {False})
+        """
+        self._right += self._left[::-1]
+        self._left.clear()
+        if trim:
+            self._right = self._right.strip(b'\x00') or bytearray(1)
 
     def get_char(self):
         """Return the value on the tape at its current location
@@ -77,7 +108,7 @@ class Tape():
         Returns:
             chr -- the value on the tape at its current location
         """
-        return self._list[self._loc]
+        return self._chars[self._right[-1]]
 
     def set_char(self, value):
         """Sets the value of the current place on the tape to value
@@ -85,7 +116,23 @@ class Tape():
         Arguments:
             value {str} -- value to be set onto the tape
         """
-        self._list[self._loc] = value
+        self._right[-1] = self._encode(value)
+
+    def get_cell(self):
+        """Return the raw cell value on the tape at its current location
+
+        Returns:
+            int -- the character code at the current location, 0 if the cell is empty
+        """
+        return self._right[-1]
+
+    def set_cell(self, value):
+        """Sets the raw cell value of the current place on the tape to value
+
+        Arguments:
+            value {int} -- character code to be set onto the tape, 0 to empty the cell
+        """
+        self._right[-1] = value
 
     def get_string(self):
         """Get the current state of the tape as a string
@@ -93,29 +140,34 @@ class Tape():
         Returns:
             str -- current state of the tape as a string
         """
-        return ''.join([item for item in self._list if item != None])
+        cells = self._left + self._right[::-1]
+        return cells.translate(None, b'\x00').decode('latin-1')
 
     def draw(self):
         """Draw the current state of the tape in the terminal
         """
-        list_enum = enumerate(self._list)
-        
-        def draw_tape():
-            for i,item in list_enum:
-                out = f'{self.char_codes.UNDERLINE}{item}{self.char_codes.END}' if item != None else f'{self.char_codes.UNDERLINE} {self.char_codes.END}'
-                if i == self._loc:
-                    print(f'{self.char_codes.RED}{out}{self.char_codes.END}', end='')
-                else:
-                    print(f'{out}', end='')
-            print(' ', end='\r')
+        draw_cell = self._drawn_cells.__getitem__
 
-        draw_tape()
-        # draw_head()
+        # The head splits the tape into the cells before it, itself and the (reversed) cells after it, so each part is
+        # drawn in one pass without checking every cell against the head position
+        parts = [
+            ''.join(map(draw_cell, self._left)),
+            self._drawn_heads[self._right[-1]],
+            ''.join(map(draw_cell, self._right[-2::-1])),
+            ' \r',
+        ]
+
+        sys.stdout.write(''.join(parts))
+        sys.stdout.flush()
 
 
 class TuringMachine():
     """Implimentation of a Turing Machine
     """
+    __slots__ = ('tape', 'states', 'current_state', 'current_input', '_accepting_states', '_rejecting_states',
+                 '_halting_states', '_transition_fn', '_code', '_n_symbols', '_state_rows', '_row_states', '_table',
+                 '_step_until_halted')
+
     def __init__(self, initial_tape, initial_state, states, accepting_states, rejecting_states, transitions):
         """Implementation of a Turing Machine
 
@@ -132,50 +184,141 @@ class TuringMachine():
         self.current_state = initial_state
         self.current_input = self.tape.get_char()
         
-        self._accepting_states = accepting_states
-        self._rejecting_states = rejecting_states
+        self._accepting_states = frozenset(accepting_states)
+        self._rejecting_states = frozenset(rejecting_states)
+        self._halting_states = self._accepting_states | self._rejecting_states
         self._transition_fn = transitions
 
-    def run(self, draw=False, print_configs=False):
+        # Give each cell value the transitions read a dense code (every other value shares one extra code) and each state
+        # the machine can be in a dense row, and flatten the transition function into a list indexed by the state's row
+        # offset + code, so a step is integer indexing rather than hashing a fresh (state, input) tuple and the table only
+        # has a row per state and a column per symbol actually used. Missing transitions are left as None.
+        cells = sorted({Tape._encode(char_in) for _, char_in in transitions})
+        self._code = [len(cells)] * 256
+        for code, cell in enumerate(cells):
+            self._code[cell] = code
+        self._n_symbols = len(cells) + 1
+
+        used_states = {initial_state} | {state for state, _ in transitions}
+        used_states |= {next_state for next_state, _, _ in transitions.values()}
+        for state in used_states:
+            if not isinstance(state, numbers.Integral) or state < 0:
+                raise ValueError(f'state {state!r} is not a non-negative integer')
+        self._state_rows = {state: row * self._n_symbols for row, state in enumerate(sorted(used_states))}
+        self._row_states = {row: state for state, row in self._state_rows.items()}
+        self._table = [None] * (len(used_states) * self._n_symbols)
+        for (state, char_in), (next_state, char_out, direction) in transitions.items():
+            index = self._state_rows[state] + self._code[Tape._encode(char_in)]
+            self._table[index] = (self._state_rows[next_state], Tape._encode(char_out), direction)
+
+        self._step_until_halted = self._build_step_until_halted()
+
+    def run(self, draw=False, print_configs=False, delay=0.0):
         """Iterate the turing machine until it enters an accepting or rejecting state
 
         Keyword Arguments:
             draw {bool} -- If True, draw the tape on each iteration (default: {False})
             print_configs {bool} -- If True, print the configuration on each iteration. Overrides draw. (default: {False})
+            delay {float} -- Seconds to pause after each drawn or printed iteration (default: {0.0})
 
         Returns:
             str -- The final state of the tape as a string
         """
-        while self.current_state not in self._accepting_states:
-            self.advance()
+        if print_configs or draw:
+            self._run_drawn(print_configs, delay)
+        else:
+            self._run_silent()
+        return self.tape.get_string()
+
+    def _run_drawn(self, print_configs, delay):
+        """Iterate the turing machine until it enters an accepting or rejecting state, showing each iteration
+
+        Arguments:
+            print_configs {bool} -- If True, print the configuration on each iteration, otherwise draw the tape
+            delay {float} -- Seconds to pause after each iteration
+        """
+        tape = self.tape
+        advance = self.advance
+        halting_states = self._halting_states
+        while self.current_state not in halting_states:
+            state = self.current_state
+            next_state, output, direction = advance()
 
             if print_configs:
-                draw = False
-                next_state, output, direction = self._transition_fn[(self.current_state, self.current_input)]
-                print(f'({self.current_state}, {self.current_input}, {output}, {next_state}, {direction})')
-                sleep(0.2)
-
-            if draw == True:
-                self.tape.draw()
-                sleep(0.2)
-        return self.tape.get_string()
+                print(f'({state}, {self.current_input}, {output}, {next_state}, {direction})')
+            else:
+                tape.draw()
+
+            if delay:
+                sleep(delay)
+
+    def _build_step_until_halted(self):
+        """Build the loop used by _run_silent for this machine
+
+        The tables and halting states are bound as default arguments so the loop reads them as locals.
+
+        Returns:
+            function -- Takes the tape's stacks, the current state's row offset and the current cell value, steps the
+            machine until it halts or reaches a missing transition and returns (row offset, last cell value read, cell
+            value with no transition or None if the machine halted)
+        """
+        halting_rows = frozenset(row for state, row in self._state_rows.items() if state in self._halting_states)
+
+        def step_until_halted(left, right, row, cell, table=self._table, code=self._code, halting_rows=halting_rows):
+            while row not in halting_rows:
+                cell_in = right[-1]
+                next_config = table[row + code[cell_in]]
+                if next_config is None:
+                    return row, cell, cell_in
+                cell = cell_in
+                row, cell_out, direction = next_config
+                if direction > 0:
+                    right.pop()
+                    left.append(cell_out)
+                    if not right:
+                        right.append(0)
+                else:
+                    right[-1] = cell_out
+                    if direction < 0:
+                        right.append(left.pop() if left else 0)
+            return row, cell, None
+
+        return step_until_halted
+
+    def _run_silent(self):
+        """Iterate the turing machine until it enters an accepting or rejecting state, with the step inlined into one loop
+
+        Equivalent to calling advance() until the machine halts, but the loop is built for this machine with its tables
+        bound as locals and the head moves work directly on the tape's stacks, so no attribute lookups or method calls
+        are made per step.
+        """
+        row, cell, missing_cell = self._step_until_halted(
+            self.tape._left, self.tape._right, self._state_rows[self.current_state], Tape._encode(self.current_input))
+        self.current_state = state = self._row_states[row]
+        self.current_input = Tape._chars[cell]
+        if missing_cell is not None:
+            raise KeyError((state, Tape._chars[missing_cell]))
 
     def advance(self):
         """Advance the configuration of the turing machine by changing states, reading/writing, and moving the tape
-        """
-        self.current_input = self.tape.get_char()
-        current_config = (self.current_state, self.current_input)
-        next_config = self._transition_fn[current_config]
-        next_state, char_out, direction = next_config
 
+        Returns:
+            tuple -- The transition that was taken as (next_state, output, direction)
+        """
+        tape = self.tape
+        state = self.current_state
+        cell = tape.get_cell()
+        next_config = self._table[self._state_rows[state] + self._code[cell]]
+        if next_config is None:
+            raise KeyError((state, Tape._chars[cell]))
+        next_row, cell_out, direction = next_config
+        next_state = self._row_states[next_row]
+
+        tape.set_cell(cell_out)
+        tape.move(direction)
         self.current_state = next_state
-        self.tape.set_char(char_out)
-        if direction == Tape.direction.right:
-            self.tape.move_right()
-        elif direction == Tape.direction.left:
-            self.tape.move_left()
-        elif direction == Tape.direction.stay:
-            pass
+        self.current_input = Tape._chars[cell]
+        return next_state, Tape._chars[cell_out], direction
         
 
 if __name__ == "__main__":
@@ -186,10 +329,20 @@ if __name__ == "__main__":
         byte = (byte + shift) % len(ascii_lowercase)
         return chr(byte + ord('a'))
 
+    def cipher_transitions(states, shift):
+        shifted = str.maketrans(ascii_lowercase, ''.join(cipher(c, shift=shift) for c in ascii_lowercase))
+        return {
+            **{(0,c): (1,c, Tape.direction.stay) for c in ascii_lowercase},
+            **{(1,c): (1, c.translate(shifted), Tape.direction.right) for c in ascii_lowercase},
+            (1,None): (2,None, Tape.direction.stay),
+            **{(s,' '): (s, ' ', Tape.direction.right) for s in states},
+        }
+
 
     parser = argparse.ArgumentParser()
     parser.add_argument('plaintext', type=str, help="The input to be encrypted")
     parser.add_argument('shift', type=int, help='The shift value for encryption')
+    parser.add_argument('--delay', type=float, default=0.2, help='Seconds to pause between drawn steps (default: 0.2)')
 
     args = parser.parse_args()
     string = args.plaintext
@@ -198,33 +351,17 @@ if __name__ == "__main__":
     tape = Tape(initial_state=string)
     states = [0,1,2]
     accepting_states = [2]
-    transitions = {}
-    for c in ascii_lowercase:
-        transitions[(0,c)] = (1,c, Tape.direction.stay)
-        transitions[(1,c)] = (1, cipher(c, shift=shift), Tape.direction.right)
-        transitions[(1,None)] = (2,None, Tape.direction.stay)
-    
-    for s in states:
-        transitions[(s,' ')] = (s, ' ', Tape.direction.right)
-
-    T_encrypt = TuringMachine(tape, 0, states, [2], [], transitions)
-    ciphertext = T_encrypt.run(draw=True, print_configs=False)
+    transitions = cipher_transitions(states, shift)
+
+    T_encrypt = TuringMachine(tape, 0, states, accepting_states, [], transitions)
+    T_encrypt.run(draw=True, print_configs=False, delay=args.delay)
 
     print()
 
-    tape = Tape(initial_state=ciphertext)
+    # Decrypt the ciphertext in place rather than reading it off the tape and writing it to a new one
+    tape.rewind(trim=True)
+    transitions = cipher_transitions(states, -shift)
+    T_decrypt = TuringMachine(tape, 0, states, accepting_states, [], transitions)
+    plaintext = T_decrypt.run(draw=True, delay=args.delay)
 
-    states = [0,1,2]
-    accepting_states = [2]
-    transitions = {}
-    for c in ascii_lowercase:
-        transitions[(0,c)] = (1,c, Tape.direction.stay)
-        transitions[(1,c)] = (1, cipher(c, shift=-shift), Tape.direction.right)
-        transitions[(1,None)] = (2,None, Tape.direction.stay)
-    
-    for s in states:
-        transitions[(s,' ')] = (s, ' ', Tape.direction.right)
-    T_decrypt = TuringMachine(tape, 0, states, [2], [], transitions)
-    plaintext = T_decrypt.run(draw=True)
-
-    print()
\ No newline at end of file
+    print()